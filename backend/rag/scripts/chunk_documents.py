@@ -1,29 +1,116 @@
 #!/usr/bin/env python3
 import argparse
 import json
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from itertools import groupby
 from pathlib import Path
 
+# Pages are joined with a blank line, matching the old whole-document text.
+PAGE_SEPARATOR = "\n\n"
 
-def chunk_text(text: str, chunk_size: int, overlap: int) -> list[str]:
-    chunks: list[str] = []
-    start = 0
-    n = len(text)
+
+def iter_chunks(
+    pages: Iterable[tuple[int | None, str]], chunk_size: int, overlap: int
+) -> Iterator[tuple[str, int | None, int | None]]:
+    """Yield (chunk, page_start, page_end) windows over a stream of pages.
+
+    Only the unfinished window plus the incoming page is kept in memory, so
+    long documents never need to be held as one string.
+    """
     step = max(1, chunk_size - overlap)
-    while start < n:
-        end = min(n, start + chunk_size)
-        chunk = text[start:end].strip()
+    buffer = ""
+    start = 0
+    skip = 0
+    # Buffer offset of the first character of each page still in the buffer.
+    page_offsets: list[int] = []
+    page_numbers: list[int | None] = []
+
+    def page_at(offset: int) -> int | None:
+        return page_numbers[max(0, bisect_right(page_offsets, offset) - 1)]
+
+    def window(begin: int) -> tuple[str, int | None, int | None] | None:
+        raw = buffer[begin : begin + chunk_size]
+        chunk = raw.strip()
+        if not chunk:
+            return None
+        first = begin + len(raw) - len(raw.lstrip())
+        return chunk, page_at(first), page_at(first + len(chunk) - 1)
+
+    for page_number, text in pages:
+        sep = PAGE_SEPARATOR if page_offsets else ""
+        incoming = sep + text
+        page_offset = len(sep)
+        if skip:
+            # The previous step jumped past the end of the buffer.
+            dropped = min(skip, len(incoming))
+            incoming = incoming[dropped:]
+            page_offset = max(0, page_offset - dropped)
+            skip -= dropped
+            if not incoming:
+                continue
+
+        # Drop text already behind the current window.
+        buffer = buffer[start:]
+        page_offsets = [offset - start for offset in page_offsets]
+        keep = max(0, bisect_right(page_offsets, 0) - 1)
+        page_offsets = page_offsets[keep:]
+        page_numbers = page_numbers[keep:]
+        if page_offsets:
+            page_offsets[0] = max(0, page_offsets[0])
+        start = 0
+
+        page_offsets.append(len(buffer) + page_offset)
+        page_numbers.append(page_number)
+        buffer += incoming
+
+        while len(buffer) - start >= chunk_size:
+            chunk = window(start)
+            if chunk:
+                yield chunk
+            start += step
+        if start > len(buffer):
+            skip = start - len(buffer)
+            start = len(buffer)
+
+    while start < len(buffer):
+        chunk = window(start)
         if chunk:
-            chunks.append(chunk)
+            yield chunk
         start += step
-    return chunks
+
+
+def chunk_records(records: Iterable[dict], chunk_size: int, overlap: int) -> Iterator[dict]:
+    """Chunk page records, treating each source file as its own document."""
+    # Files can share a doc_id (e.g. a paper and its supplement). Keep their text
+    # and page numbers apart, but number chunks per doc_id so chunk_ids stay unique.
+    next_index: dict[str, int] = {}
+    for (doc_id, filename), file_records in groupby(
+        records, key=lambda r: (r["doc_id"], r["filename"])
+    ):
+        # Whole-document records without a page number still chunk as one page.
+        pages = ((r.get("page"), r["text"]) for r in file_records)
+        idx = next_index.get(doc_id, 0)
+        for chunk, page_start, page_end in iter_chunks(pages, chunk_size, overlap):
+            yield {
+                "chunk_id": f"{doc_id}_chunk_{idx:04d}",
+                "doc_id": doc_id,
+                "filename": filename,
+                "chunk_index": idx,
+                "page_start": page_start,
+                "page_end": page_end,
+                "text": chunk,
+            }
+            idx += 1
+        next_index[doc_id] = idx
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Chunk parsed documents into overlapping text chunks.")
+    parser = argparse.ArgumentParser(description="Chunk parsed pages into overlapping text chunks.")
     parser.add_argument(
         "--input-jsonl",
-        default="backend/rag/data/parsed/documents.jsonl",
-        help="Input documents JSONL path",
+        default="backend/rag/data/parsed/pages.jsonl",
+        help="Input pages JSONL path (one record per page, grouped by doc_id)",
     )
     parser.add_argument(
         "--output-jsonl",
@@ -43,20 +130,10 @@ def main() -> None:
 
     total_chunks = 0
     with input_jsonl.open("r", encoding="utf-8") as f_in, output_jsonl.open("w", encoding="utf-8") as f_out:
-        for line in f_in:
-            doc = json.loads(line)
-            doc_chunks = chunk_text(doc["text"], args.chunk_size, args.overlap)
-            for idx, chunk in enumerate(doc_chunks):
-                chunk_id = f'{doc["doc_id"]}_chunk_{idx:04d}'
-                record = {
-                    "chunk_id": chunk_id,
-                    "doc_id": doc["doc_id"],
-                    "filename": doc["filename"],
-                    "chunk_index": idx,
-                    "text": chunk,
-                }
-                f_out.write(json.dumps(record, ensure_ascii=True) + "\n")
-                total_chunks += 1
+        records = (json.loads(line) for line in f_in)
+        for record in chunk_records(records, args.chunk_size, args.overlap):
+            f_out.write(json.dumps(record, ensure_ascii=True) + "\n")
+            total_chunks += 1
 
     print(f"Wrote {total_chunks} chunks to {output_jsonl}")
 
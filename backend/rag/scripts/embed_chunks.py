@@ -4,6 +4,7 @@ import json
 from pathlib import Path
 
 import numpy as np
+from index_store import rebuild_index
 from sentence_transformers import SentenceTransformer
 
 
@@ -66,11 +67,13 @@ def main() -> None:
     embeddings = model.encode(texts, show_progress_bar=True, normalize_embeddings=True)
     embeddings = np.asarray(embeddings, dtype=np.float32)
 
-    with output_jsonl.open("w", encoding="utf-8") as f:
-        for record, vec in zip(records, embeddings):
-            out = dict(record)
-            out["embedding"] = vec.tolist()
-            f.write(json.dumps(out, ensure_ascii=True) + "\n")
+    rows = []
+    for record, vec in zip(records, embeddings):
+        out = dict(record)
+        out["embedding"] = vec.tolist()
+        rows.append(out)
+    # Swap the new file in atomically so running searches keep their snapshot.
+    rebuild_index(output_jsonl, rows, model=args.model)
 
     print(f"Wrote {len(records)} embedded chunks to {output_jsonl}")
     print(f"Model: {args.model}")
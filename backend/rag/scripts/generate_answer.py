@@ -2,11 +2,14 @@
 import argparse
 import json
 import os
+import time
 import urllib.error
 import urllib.request
 from pathlib import Path
 
 import numpy as np
+from index_store import index_version, iter_live_rows
+from query_cache import SemanticQueryCache
 from sentence_transformers import SentenceTransformer
 
 
@@ -22,30 +25,26 @@ def should_use_e5_prefix(model_name: str, mode: str) -> bool:
 def load_embedded_chunks(path: Path) -> tuple[list[dict], np.ndarray]:
     records: list[dict] = []
     vectors: list[list[float]] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            row = json.loads(line)
-            vectors.append(row["embedding"])
-            clean = dict(row)
-            clean.pop("embedding", None)
-            records.append(clean)
+    for row in iter_live_rows(path):
+        vectors.append(row.pop("embedding"))
+        records.append(row)
     return records, np.asarray(vectors, dtype=np.float32)
 
 
-def retrieve_top_chunks(
-    query: str,
-    records: list[dict],
-    vectors: np.ndarray,
-    model_name: str,
-    top_k: int,
-    e5_prefix_mode: str,
-) -> list[dict]:
+def embed_query(query: str, model_name: str, e5_prefix_mode: str) -> np.ndarray:
     model = SentenceTransformer(model_name)
     use_prefix = should_use_e5_prefix(model_name, e5_prefix_mode)
     query_text = f"query: {query}" if use_prefix else query
     query_vec = model.encode([query_text], normalize_embeddings=True)
-    query_vec = np.asarray(query_vec, dtype=np.float32)
+    return np.asarray(query_vec, dtype=np.float32)
+
 
+def retrieve_top_chunks(
+    query_vec: np.ndarray,
+    records: list[dict],
+    vectors: np.ndarray,
+    top_k: int,
+) -> list[dict]:
     scores = (vectors @ query_vec.T).squeeze(axis=1)
     top_idx = np.argsort(scores)[::-1][:top_k]
 
@@ -113,6 +112,10 @@ def call_openai_chat(prompt: str, model: str) -> str:
     return body["choices"][0]["message"]["content"]
 
 
+def mock_note(query: str) -> str:
+    return f"Mock mode is active. Query was: {query}"
+
+
 def build_mock_response(query: str, retrieved: list[dict]) -> dict:
     if not retrieved:
         return {
@@ -135,10 +138,48 @@ def build_mock_response(query: str, retrieved: list[dict]) -> dict:
             }
         ],
         "confidence": "medium",
-        "note": f"Mock mode is active. Query was: {query}",
+        "note": mock_note(query),
     }
 
 
+def generate(args: argparse.Namespace, input_jsonl: Path, query_vec: np.ndarray) -> dict:
+    records, vectors = load_embedded_chunks(input_jsonl)
+    if len(records) == 0:
+        raise RuntimeError("No embedded chunks found.")
+
+    retrieved = retrieve_top_chunks(
+        query_vec=query_vec,
+        records=records,
+        vectors=vectors,
+        top_k=args.top_k,
+    )
+    prompt = build_prompt(args.query, retrieved)
+
+    if args.mode == "openai":
+        content = call_openai_chat(prompt=prompt, model=args.llm_model)
+        try:
+            answer_json = json.loads(content)
+        except json.JSONDecodeError:
+            answer_json = {
+                "answer": content,
+                "evidence": [],
+                "confidence": "unknown",
+                "warning": "Model did not return strict JSON.",
+            }
+    else:
+        answer_json = build_mock_response(args.query, retrieved)
+
+    answer_json["retrieval"] = [
+        {
+            "doc_id": r["doc_id"],
+            "chunk_id": r["chunk_id"],
+            "score": r["score"],
+        }
+        for r in retrieved
+    ]
+    return answer_json
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Generate a RAG answer from local embeddings.")
     parser.add_argument("--query", required=True, help="User question")
@@ -175,7 +216,37 @@ def main() -> None:
         default="backend/rag/data/answers/last_answer.json",
         help="Where to save the generated output JSON",
     )
+    parser.add_argument(
+        "--cache-path",
+        default="backend/rag/data/cache/query_cache.json",
+        help="Semantic query cache file",
+    )
+    parser.add_argument(
+        "--cache-threshold",
+        type=float,
+        default=0.95,
+        help="Minimum cosine similarity to reuse a cached answer",
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=512,
+        help="Cached answers kept before evicting the least recently used",
+    )
+    parser.add_argument(
+        "--cache-ttl-hours",
+        type=float,
+        default=168,
+        help="Expire cached answers after this many hours",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Skip the semantic query cache")
     args = parser.parse_args()
+    if not 0 < args.cache_threshold <= 1:
+        parser.error("--cache-threshold must be in (0, 1]")
+    if args.cache_max_entries < 0:
+        parser.error("--cache-max-entries must be >= 0")
+    if args.cache_ttl_hours <= 0:
+        parser.error("--cache-ttl-hours must be > 0")
 
     input_jsonl = Path(args.input_jsonl)
     output_json = Path(args.output_json)
@@ -184,47 +255,62 @@ def main() -> None:
     if not input_jsonl.exists():
         raise FileNotFoundError(f"Missing input file: {input_jsonl}")
 
-    records, vectors = load_embedded_chunks(input_jsonl)
-    if len(records) == 0:
-        raise RuntimeError("No embedded chunks found.")
-
-    retrieved = retrieve_top_chunks(
-        query=args.query,
-        records=records,
-        vectors=vectors,
-        model_name=args.embed_model,
-        top_k=args.top_k,
-        e5_prefix_mode=args.e5_prefix_mode,
+    query_vec = embed_query(args.query, args.embed_model, args.e5_prefix_mode)
+    # Answers depend on every knob below, so only reuse entries that match them all.
+    cache_config = json.dumps(
+        [args.embed_model, args.e5_prefix_mode, args.top_k, args.mode, args.llm_model]
     )
-    prompt = build_prompt(args.query, retrieved)
-
-    if args.mode == "openai":
-        content = call_openai_chat(prompt=prompt, model=args.llm_model)
-        try:
-            answer_json = json.loads(content)
-        except json.JSONDecodeError:
-            answer_json = {
-                "answer": content,
-                "evidence": [],
-                "confidence": "unknown",
-                "warning": "Model did not return strict JSON.",
-            }
-    else:
-        answer_json = build_mock_response(args.query, retrieved)
-
-    answer_json["retrieval"] = [
-        {
-            "doc_id": r["doc_id"],
-            "chunk_id": r["chunk_id"],
-            "score": r["score"],
+    cache = None
+    cached = None
+    if not args.no_cache:
+        cache = SemanticQueryCache(
+            Path(args.cache_path),
+            index_version=index_version(input_jsonl),
+            threshold=args.cache_threshold,
+            max_entries=args.cache_max_entries,
+            ttl_s=args.cache_ttl_hours * 3600,
+        )
+        cached = cache.lookup(query_vec, cache_config)
+
+    if cached is not None:
+        entry, similarity = cached
+        answer_json = dict(entry["result"])
+        if "note" in answer_json:
+            # The mock note echoes the question; report this one, not the cached one.
+            answer_json["note"] = mock_note(args.query)
+        answer_json["cache"] = {
+            "hit": True,
+            "similarity": similarity,
+            "cached_query": entry["query"],
+            "saved_latency_s": entry["latency_s"],
         }
-        for r in retrieved
-    ]
+    else:
+        started = time.perf_counter()
+        answer_json = generate(args, input_jsonl, query_vec)
+        if cache is not None:
+            cache.store(
+                args.query,
+                query_vec,
+                cache_config,
+                answer_json,
+                latency_s=time.perf_counter() - started,
+            )
+            answer_json = dict(answer_json, cache={"hit": False})
 
     with output_json.open("w", encoding="utf-8") as f:
         json.dump(answer_json, f, ensure_ascii=True, indent=2)
 
     print(f"Wrote answer to {output_json}")
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError as exc:
+            print(f"Warning: could not save query cache {args.cache_path}: {exc}")
+        print(
+            f"Cache {'hit' if cached else 'miss'}: hit rate {cache.hit_rate():.0%} "
+            f"({cache.stats['hits']}/{cache.stats['hits'] + cache.stats['misses']}), "
+            f"saved {cache.stats['saved_latency_s']:.1f}s total"
+        )
     print(json.dumps(answer_json, ensure_ascii=True, indent=2))
 
 
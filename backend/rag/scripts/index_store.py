@@ -0,0 +1,351 @@
+"""
+Append-only storage for the local embeddings JSONL.
+
+The embeddings file stays a plain JSONL of chunk records. A sidecar manifest
+(`<file>.manifest.json`) records how many bytes of it are committed plus the
+doc_id tombstones, which lets a writer append or delete papers in place:
+
+- Readers snapshot the manifest, open the data file, and never read past
+  `committed_bytes`, so a half-written append is invisible to them.
+- A tombstone maps doc_id -> byte offset; rows of that doc written before the
+  offset are dead. Re-appending a doc after deleting it therefore works.
+- Compaction rewrites only live rows into a new file and swaps it in with
+  `os.replace`. Readers that already opened the old file keep reading it,
+  and the index version is unchanged because the live rows are the same.
+- The manifest records the data file's inode. If a crash lands between
+  swapping in a new data file and writing its manifest, the stale manifest
+  no longer matches and the (fully written) data file is read as-is.
+
+Writers are serialised with a lock file. Readers only take a shared lock for
+the instant it takes to read the manifest and open the data file, and never
+need write access when the lock file already exists.
+
+A data file without a manifest (e.g. an older full build) is read as fully
+committed with no tombstones.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import json
+import os
+import uuid
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO, Any
+
+MANIFEST_FORMAT = 1
+
+
+def manifest_path(data_path: Path) -> Path:
+    return data_path.with_name(data_path.name + ".manifest.json")
+
+
+def _swap_lock_path(data_path: Path) -> Path:
+    return data_path.with_name(data_path.name + ".lock")
+
+
+def _writer_lock_path(data_path: Path) -> Path:
+    return data_path.with_name(data_path.name + ".writer.lock")
+
+
+@contextlib.contextmanager
+def _flock(path: Path, mode: int) -> Iterator[None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as f:
+        fcntl.flock(f.fileno(), mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def _read_lock(data_path: Path) -> Iterator[None]:
+    if not data_path.exists():
+        raise FileNotFoundError(f"Missing input file: {data_path}")
+    path = _swap_lock_path(data_path)
+    try:
+        # flock works on read-only descriptors, so an existing lock file never
+        # needs write access.
+        f = path.open("r") if path.exists() else path.open("a")
+    except OSError:
+        # No lock file and no write access: nothing can be writing, read unlocked.
+        yield
+        return
+    with f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _fingerprint(stat: os.stat_result) -> list[int]:
+    return [stat.st_dev, stat.st_ino]
+
+
+def _new_manifest(model: str | None = None) -> dict[str, Any]:
+    return {
+        "format": MANIFEST_FORMAT,
+        "index_id": uuid.uuid4().hex,
+        "seq": 0,
+        "model": model,
+        "committed_bytes": 0,
+        "rows": 0,
+        "dead_rows": 0,
+        "doc_rows": {},
+        "tombstones": {},
+    }
+
+
+def _legacy_manifest(data_path: Path) -> dict[str, Any]:
+    stat = data_path.stat()
+    manifest = _new_manifest()
+    manifest["index_id"] = f"legacy-{stat.st_size}-{stat.st_mtime_ns}"
+    manifest["committed_bytes"] = stat.st_size
+    # Row counts are only needed by writers; see _load_for_write.
+    manifest["rows"] = None
+    manifest["doc_rows"] = None
+    return manifest
+
+
+def read_manifest(data_path: Path) -> dict[str, Any]:
+    if not data_path.exists():
+        raise FileNotFoundError(f"Missing input file: {data_path}")
+    mpath = manifest_path(data_path)
+    if mpath.exists():
+        manifest = json.loads(mpath.read_text(encoding="utf-8"))
+        fingerprint = manifest.get("data_file")
+        if fingerprint is None or fingerprint == _fingerprint(data_path.stat()):
+            return manifest
+    # No manifest, or one left behind by a swap that crashed before its
+    # manifest was written. Swapped-in files are complete, so read it whole.
+    return _legacy_manifest(data_path)
+
+
+def index_version(data_path: Path) -> str:
+    """Identifier that changes whenever the set of live rows may have changed."""
+    with _read_lock(data_path):
+        manifest = read_manifest(data_path)
+    return f"{manifest['index_id']}:{manifest['seq']}"
+
+
+def _write_manifest(data_path: Path, manifest: dict[str, Any]) -> None:
+    manifest["data_file"] = _fingerprint(data_path.stat())
+    mpath = manifest_path(data_path)
+    tmp = mpath.with_name(mpath.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=True, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, mpath)
+
+
+def _iter_committed(f: IO[bytes], manifest: dict[str, Any]) -> Iterator[tuple[int, bytes]]:
+    limit = manifest["committed_bytes"]
+    offset = 0
+    while offset < limit:
+        line = f.readline()
+        if not line or offset + len(line) > limit:
+            break
+        row_offset = offset
+        offset += len(line)
+        if line.strip():
+            yield row_offset, line
+
+
+def _is_dead(row: dict[str, Any], row_offset: int, tombstones: dict[str, int]) -> bool:
+    cutoff = tombstones.get(row["doc_id"])
+    return cutoff is not None and row_offset < cutoff
+
+
+def _iter_live(f: IO[bytes], manifest: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    tombstones = manifest["tombstones"]
+    for row_offset, line in _iter_committed(f, manifest):
+        row = json.loads(line)
+        if not _is_dead(row, row_offset, tombstones):
+            yield row
+
+
+def iter_live_rows(data_path: Path) -> Iterator[dict[str, Any]]:
+    """Yield live rows from a consistent snapshot of the index."""
+    with _read_lock(data_path):
+        manifest = read_manifest(data_path)
+        f = data_path.open("rb")
+    with f:
+        yield from _iter_live(f, manifest)
+
+
+def _encode_row(row: dict[str, Any]) -> bytes:
+    return (json.dumps(row, ensure_ascii=True) + "\n").encode("utf-8")
+
+
+def _load_for_write(data_path: Path, create: bool = False) -> dict[str, Any]:
+    if create and not data_path.exists():
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        data_path.touch()
+        return _new_manifest()
+
+    manifest = read_manifest(data_path)
+    if manifest["doc_rows"] is None:
+        # First write to a legacy file: count rows once so the manifest can
+        # track live rows per doc from here on.
+        doc_rows: dict[str, int] = {}
+        rows = 0
+        with data_path.open("rb") as f:
+            for _, line in _iter_committed(f, manifest):
+                doc_id = json.loads(line)["doc_id"]
+                doc_rows[doc_id] = doc_rows.get(doc_id, 0) + 1
+                rows += 1
+        manifest["doc_rows"] = doc_rows
+        manifest["rows"] = rows
+    return manifest
+
+
+def _tombstone(manifest: dict[str, Any], doc_ids: Iterable[str]) -> list[str]:
+    removed: list[str] = []
+    for doc_id in doc_ids:
+        live = manifest["doc_rows"].pop(doc_id, 0)
+        if not live:
+            continue
+        manifest["dead_rows"] += live
+        manifest["tombstones"][doc_id] = manifest["committed_bytes"]
+        removed.append(doc_id)
+    return removed
+
+
+def _commit(data_path: Path, manifest: dict[str, Any]) -> None:
+    manifest["seq"] += 1
+    with _flock(_swap_lock_path(data_path), fcntl.LOCK_EX):
+        _write_manifest(data_path, manifest)
+
+
+def live_doc_ids(data_path: Path) -> set[str]:
+    if not data_path.exists():
+        return set()
+    with _flock(_writer_lock_path(data_path), fcntl.LOCK_EX):
+        return set(_load_for_write(data_path)["doc_rows"])
+
+
+def append_rows(
+    data_path: Path,
+    rows: Iterable[dict[str, Any]],
+    model: str | None = None,
+    replace: bool = False,
+) -> tuple[dict[str, Any], set[str]]:
+    """Append embedded rows for documents that are not live yet.
+
+    Rows of a doc_id that is already live are skipped, or with `replace` its old
+    rows are tombstoned in the same commit. The check runs under the writer lock,
+    so overlapping appends cannot both add the same document. Returns the
+    manifest and the doc_ids that were skipped.
+    """
+    with _flock(_writer_lock_path(data_path), fcntl.LOCK_EX):
+        manifest = _load_for_write(data_path, create=True)
+        if model and manifest["model"] and manifest["model"] != model:
+            raise RuntimeError(
+                f"Index was built with {manifest['model']}, refusing to append {model} vectors."
+            )
+        manifest["model"] = manifest["model"] or model
+        live = set(manifest["doc_rows"])
+        skipped: set[str] = set()
+
+        with data_path.open("r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size < manifest["committed_bytes"]:
+                raise RuntimeError(
+                    f"{data_path} is {size} bytes but the manifest committed "
+                    f"{manifest['committed_bytes']}; refusing to append."
+                )
+            # Drop anything a crashed writer left past the committed end.
+            f.truncate(manifest["committed_bytes"])
+            f.seek(manifest["committed_bytes"])
+            for row in rows:
+                doc_id = row["doc_id"]
+                if doc_id in live:
+                    if not replace:
+                        skipped.add(doc_id)
+                        continue
+                    # Cutoff is the pre-append committed end, so new rows stay live.
+                    _tombstone(manifest, [doc_id])
+                    live.discard(doc_id)
+                f.write(_encode_row(row))
+                doc_rows = manifest["doc_rows"]
+                doc_rows[row["doc_id"]] = doc_rows.get(row["doc_id"], 0) + 1
+                manifest["rows"] += 1
+            f.flush()
+            os.fsync(f.fileno())
+            manifest["committed_bytes"] = f.tell()
+
+        _commit(data_path, manifest)
+        return manifest, skipped
+
+
+def delete_docs(data_path: Path, doc_ids: Iterable[str]) -> tuple[dict[str, Any], list[str]]:
+    """Tombstone every row of `doc_ids`. Returns the manifest and the doc_ids removed."""
+    if not data_path.exists():
+        raise FileNotFoundError(f"Missing input file: {data_path}")
+    with _flock(_writer_lock_path(data_path), fcntl.LOCK_EX):
+        manifest = _load_for_write(data_path)
+        removed = _tombstone(manifest, doc_ids)
+        if removed:
+            _commit(data_path, manifest)
+        return manifest, removed
+
+
+def _swap_in(data_path: Path, tmp: Path, manifest: dict[str, Any]) -> None:
+    with _flock(_swap_lock_path(data_path), fcntl.LOCK_EX):
+        os.replace(tmp, data_path)
+        _write_manifest(data_path, manifest)
+
+
+def _write_rows_file(tmp: Path, rows: Iterable[dict[str, Any]], manifest: dict[str, Any]) -> None:
+    with tmp.open("wb") as f:
+        for row in rows:
+            f.write(_encode_row(row))
+            doc_rows = manifest["doc_rows"]
+            doc_rows[row["doc_id"]] = doc_rows.get(row["doc_id"], 0) + 1
+            manifest["rows"] += 1
+        f.flush()
+        os.fsync(f.fileno())
+        manifest["committed_bytes"] = f.tell()
+
+
+def rebuild_index(
+    data_path: Path, rows: Iterable[dict[str, Any]], model: str | None = None
+) -> dict[str, Any]:
+    """Replace the whole index with `rows` under a fresh index_id."""
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    with _flock(_writer_lock_path(data_path), fcntl.LOCK_EX):
+        manifest = _new_manifest(model)
+        manifest["seq"] = 1
+        tmp = data_path.with_name(data_path.name + ".rebuild.tmp")
+        _write_rows_file(tmp, rows, manifest)
+        _swap_in(data_path, tmp, manifest)
+        return manifest
+
+
+def needs_compaction(manifest: dict[str, Any], threshold: float) -> bool:
+    rows = manifest["rows"] or 0
+    return rows > 0 and manifest["dead_rows"] / rows >= threshold
+
+
+def compact(data_path: Path) -> dict[str, Any]:
+    """Rewrite the index without tombstoned rows. Readers are never blocked.
+
+    The live rows are unchanged, so the index version is kept as well.
+    """
+    if not data_path.exists():
+        raise FileNotFoundError(f"Missing input file: {data_path}")
+    with _flock(_writer_lock_path(data_path), fcntl.LOCK_EX):
+        old = _load_for_write(data_path)
+        manifest = _new_manifest(old["model"])
+        manifest["index_id"] = old["index_id"]
+        manifest["seq"] = old["seq"]
+        tmp = data_path.with_name(data_path.name + ".compact.tmp")
+        with data_path.open("rb") as f:
+            _write_rows_file(tmp, _iter_live(f, old), manifest)
+        _swap_in(data_path, tmp, manifest)
+        return manifest
@@ -2,6 +2,7 @@
 import argparse
 import json
 import re
+from collections.abc import Iterator
 from pathlib import Path
 
 from pypdf import PdfReader
@@ -17,27 +18,28 @@ def extract_doc_id(filename: str) -> str:
     return Path(filename).stem
 
 
-def parse_pdf(pdf_path: Path) -> str:
+def iter_pages(pdf_path: Path) -> Iterator[tuple[int, str]]:
+    """Yield (page_number, text) one page at a time, skipping empty pages."""
     reader = PdfReader(str(pdf_path))
-    pages = []
-    for page in reader.pages:
+    for page_number, page in enumerate(reader.pages, start=1):
         text = page.extract_text() or ""
-        if text.strip():
-            pages.append(text)
-    joined = "\n\n".join(pages)
-    # Basic normalization to reduce noisy whitespace.
-    joined = re.sub(r"[ \t]+", " ", joined)
-    joined = re.sub(r"\n{3,}", "\n\n", joined)
-    return joined.strip()
+        # Basic normalization to reduce noisy whitespace.
+        text = re.sub(r"[ \t]+", " ", text)
+        text = re.sub(r"\n{3,}", "\n\n", text)
+        text = text.strip()
+        if text:
+            yield page_number, text
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Extract text from all PDFs in a folder.")
+    parser = argparse.ArgumentParser(
+        description="Extract text from all PDFs in a folder, one record per page."
+    )
     parser.add_argument("--input-dir", default="backend/rag/sources", help="Directory containing PDFs")
     parser.add_argument(
         "--output-jsonl",
-        default="backend/rag/data/parsed/documents.jsonl",
-        help="Output JSONL path for parsed documents",
+        default="backend/rag/data/parsed/pages.jsonl",
+        help="Output JSONL path for parsed pages",
     )
     args = parser.parse_args()
 
@@ -51,21 +53,26 @@ def main() -> None:
         return
 
     written = 0
+    pages_written = 0
     with output_jsonl.open("w", encoding="utf-8") as f:
         for pdf in pdf_files:
-            text = parse_pdf(pdf)
-            if not text:
-                continue
-            record = {
-                "doc_id": extract_doc_id(pdf.name),
-                "filename": pdf.name,
-                "source_path": str(pdf),
-                "text": text,
-            }
-            f.write(json.dumps(record, ensure_ascii=True) + "\n")
-            written += 1
+            doc_id = extract_doc_id(pdf.name)
+            doc_pages = 0
+            for page_number, text in iter_pages(pdf):
+                record = {
+                    "doc_id": doc_id,
+                    "filename": pdf.name,
+                    "source_path": str(pdf),
+                    "page": page_number,
+                    "text": text,
+                }
+                f.write(json.dumps(record, ensure_ascii=True) + "\n")
+                doc_pages += 1
+            if doc_pages:
+                written += 1
+                pages_written += doc_pages
 
-    print(f"Parsed {written} documents to {output_jsonl}")
+    print(f"Parsed {written} documents ({pages_written} pages) to {output_jsonl}")
 
 
 if __name__ == "__main__":
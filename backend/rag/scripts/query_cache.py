@@ -0,0 +1,141 @@
+"""
+Similarity-keyed cache for generated answers.
+
+Entries store the normalised query embedding next to the answer JSON. A new
+query is served from the cache when its cosine similarity to a stored query is
+at least `threshold` and the entry was produced with the same generation
+config (models, mode, top_k). Entries expire after `ttl_s`, the least recently
+used ones are evicted beyond `max_entries`, and the whole cache is dropped when
+the index version it was built against changes.
+
+The cache is a single JSON file replaced atomically on save via a per-process
+temp file. Concurrent writers can lose each other's entries, and an unreadable
+file is treated as empty, so a race only costs future misses.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+
+def _empty_stats() -> dict[str, float]:
+    return {"hits": 0, "misses": 0, "saved_latency_s": 0.0, "invalidations": 0}
+
+
+class SemanticQueryCache:
+    def __init__(
+        self,
+        path: Path,
+        index_version: str,
+        threshold: float = 0.95,
+        max_entries: int = 512,
+        ttl_s: float = 7 * 24 * 3600,
+    ) -> None:
+        self.path = path
+        self.index_version = index_version
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.entries: list[dict[str, Any]] = []
+        self.stats = _empty_stats()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # Missing or corrupt: a lost cache only costs misses, so start empty.
+            return
+        if not isinstance(data, dict):
+            return
+        self.stats = {**_empty_stats(), **data.get("stats", {})}
+        if data.get("index_version") != self.index_version:
+            # Retrieval results are stale once the index changes.
+            self.stats["invalidations"] += 1
+            return
+        self.entries = data.get("entries", [])
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "index_version": self.index_version,
+            "stats": self.stats,
+            "entries": self.entries,
+        }
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=self.path.parent,
+            prefix=self.path.name + ".",
+            suffix=".tmp",
+            delete=False,
+        ) as f:
+            json.dump(data, f, ensure_ascii=True)
+        try:
+            os.replace(f.name, self.path)
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+    def _evict(self, now: float) -> None:
+        self.entries = [e for e in self.entries if now - e["created_at"] < self.ttl_s]
+        if len(self.entries) > self.max_entries:
+            self.entries.sort(key=lambda e: e["last_used_at"], reverse=True)
+            del self.entries[self.max_entries :]
+
+    def lookup(self, query_vec: np.ndarray, config: str) -> tuple[dict[str, Any], float] | None:
+        """Return (entry, similarity) for the closest cached query, or None on a miss."""
+        now = time.time()
+        self._evict(now)
+        candidates = [e for e in self.entries if e["config"] == config]
+        if candidates:
+            matrix = np.asarray([e["embedding"] for e in candidates], dtype=np.float32)
+            scores = matrix @ np.asarray(query_vec, dtype=np.float32).ravel()
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity >= self.threshold:
+                entry = candidates[best]
+                entry["last_used_at"] = now
+                entry["hits"] += 1
+                self.stats["hits"] += 1
+                self.stats["saved_latency_s"] += entry["latency_s"]
+                return entry, similarity
+        self.stats["misses"] += 1
+        return None
+
+    def store(
+        self,
+        query: str,
+        query_vec: np.ndarray,
+        config: str,
+        result: dict[str, Any],
+        latency_s: float,
+    ) -> None:
+        if "warning" in result:
+            # Degraded answers (e.g. non-JSON LLM output) should be retried, not reused.
+            return
+        now = time.time()
+        self.entries.append(
+            {
+                "query": query,
+                "config": config,
+                "embedding": np.asarray(query_vec, dtype=np.float32).ravel().tolist(),
+                "result": result,
+                "latency_s": latency_s,
+                "created_at": now,
+                "last_used_at": now,
+                "hits": 0,
+            }
+        )
+        self._evict(now)
+
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 import argparse
-import json
 from pathlib import Path
 
 import numpy as np
+from index_store import iter_live_rows
 from sentence_transformers import SentenceTransformer
 
 
@@ -19,13 +19,9 @@ def should_use_e5_prefix(model_name: str, mode: str) -> bool:
 def load_embedded_chunks(path: Path) -> tuple[list[dict], np.ndarray]:
     records: list[dict] = []
     vectors: list[list[float]] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            row = json.loads(line)
-            vectors.append(row["embedding"])
-            row = dict(row)
-            row.pop("embedding", None)
-            records.append(row)
+    for row in iter_live_rows(path):
+        vectors.append(row.pop("embedding"))
+        records.append(row)
     return records, np.asarray(vectors, dtype=np.float32)
 
 
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+from index_store import (
+    append_rows,
+    compact,
+    delete_docs,
+    live_doc_ids,
+    needs_compaction,
+    read_manifest,
+)
+from sentence_transformers import SentenceTransformer
+
+
+def should_use_e5_prefix(model_name: str, mode: str) -> bool:
+    if mode == "on":
+        return True
+    if mode == "off":
+        return False
+    lowered = model_name.lower()
+    return "e5" in lowered
+
+
+def embed_records(records: list[dict], model_name: str, e5_prefix_mode: str) -> list[dict]:
+    model = SentenceTransformer(model_name)
+    use_prefix = should_use_e5_prefix(model_name, e5_prefix_mode)
+    texts = [
+        f"passage: {r['text']}" if use_prefix else r["text"]
+        for r in records
+    ]
+    embeddings = model.encode(texts, show_progress_bar=True, normalize_embeddings=True)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+
+    rows = []
+    for record, vec in zip(records, embeddings, strict=True):
+        out = dict(record)
+        out["embedding"] = vec.tolist()
+        rows.append(out)
+    return rows
+
+
+def maybe_compact(index_jsonl: Path, manifest: dict, threshold: float) -> None:
+    if not needs_compaction(manifest, threshold):
+        return
+    # Compact in a detached process so this command returns right away; the
+    # writer lock keeps it ordered with later appends and deletes.
+    log_path = index_jsonl.with_name(index_jsonl.name + ".compact.log")
+    with log_path.open("a", encoding="utf-8") as log:
+        subprocess.Popen(
+            [
+                sys.executable,
+                str(Path(__file__).resolve()),
+                "--index-jsonl",
+                str(index_jsonl),
+                "compact",
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+    print(
+        f"Tombstoned rows {manifest['dead_rows']}/{manifest['rows']} "
+        f"passed threshold {threshold:.2f}, compacting in the background (log: {log_path})."
+    )
+
+
+def report_skipped(skipped: set[str]) -> None:
+    if skipped:
+        print(f"Skipped {len(skipped)} documents already in the index (use --replace to re-embed)")
+
+
+def cmd_append(args: argparse.Namespace) -> None:
+    input_jsonl = Path(args.input_jsonl)
+    index_jsonl = Path(args.index_jsonl)
+    if not input_jsonl.exists():
+        raise FileNotFoundError(f"Missing input file: {input_jsonl}")
+
+    wanted = set(args.doc_id or [])
+    # Pre-filter so live documents are not embedded for nothing. append_rows
+    # repeats the check under the writer lock, which is what keeps it correct.
+    existing = live_doc_ids(index_jsonl)
+    records = []
+    skipped: set[str] = set()
+    with input_jsonl.open("r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            doc_id = record["doc_id"]
+            if wanted and doc_id not in wanted:
+                continue
+            if doc_id in existing and not args.replace:
+                skipped.add(doc_id)
+                continue
+            records.append(record)
+
+    if not records:
+        report_skipped(skipped)
+        print("No new chunk records to append.")
+        return
+
+    rows = embed_records(records, args.model, args.e5_prefix_mode)
+    manifest, late_skipped = append_rows(
+        index_jsonl,
+        rows,
+        model=args.model,
+        replace=args.replace,
+    )
+    skipped |= late_skipped
+    appended = [r for r in rows if r["doc_id"] not in late_skipped]
+    doc_ids = {r["doc_id"] for r in appended}
+    print(f"Appended {len(appended)} chunks from {len(doc_ids)} documents to {index_jsonl}")
+    report_skipped(skipped)
+    maybe_compact(index_jsonl, manifest, args.compact_threshold)
+
+
+def cmd_delete(args: argparse.Namespace) -> None:
+    index_jsonl = Path(args.index_jsonl)
+    manifest, removed = delete_docs(index_jsonl, args.doc_id)
+    missing = sorted(set(args.doc_id) - set(removed))
+    print(f"Tombstoned {len(removed)} documents in {index_jsonl}")
+    if missing:
+        print(f"Not in index: {', '.join(missing)}")
+    maybe_compact(index_jsonl, manifest, args.compact_threshold)
+
+
+def cmd_compact(args: argparse.Namespace) -> None:
+    index_jsonl = Path(args.index_jsonl)
+    manifest = compact(index_jsonl)
+    print(f"Compacted index to {manifest['rows']} rows ({manifest['committed_bytes']} bytes)")
+
+
+def cmd_status(args: argparse.Namespace) -> None:
+    manifest = read_manifest(Path(args.index_jsonl))
+    status = {key: value for key, value in manifest.items() if key != "doc_rows"}
+    if manifest["doc_rows"] is not None:
+        status["documents"] = len(manifest["doc_rows"])
+    print(json.dumps(status, ensure_ascii=True, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Append or delete documents in the local embeddings index without a rebuild."
+    )
+    parser.add_argument(
+        "--index-jsonl",
+        default="backend/rag/data/embeddings/chunks_with_embeddings.jsonl",
+        help="Embedded chunks JSONL path",
+    )
+    parser.add_argument(
+        "--compact-threshold",
+        type=float,
+        default=0.25,
+        help="Compact once this fraction of stored rows is tombstoned",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    append = subparsers.add_parser("append", help="Embed and append chunks for new documents")
+    append.add_argument(
+        "--input-jsonl",
+        default="backend/rag/data/chunks/chunks.jsonl",
+        help="Input chunks JSONL path",
+    )
+    append.add_argument(
+        "--doc-id",
+        action="append",
+        help="Only append this doc_id (repeatable). Defaults to every doc in the input.",
+    )
+    append.add_argument(
+        "--replace",
+        action="store_true",
+        help="Re-embed documents already in the index, tombstoning their old chunks",
+    )
+    append.add_argument(
+        "--model",
+        default="intfloat/e5-small-v2",
+        help="SentenceTransformers model name",
+    )
+    append.add_argument(
+        "--e5-prefix-mode",
+        choices=["auto", "on", "off"],
+        default="auto",
+        help="Prefix chunks with 'passage: ' when using E5 models",
+    )
+    append.set_defaults(func=cmd_append)
+
+    delete = subparsers.add_parser("delete", help="Tombstone every chunk of a document")
+    delete.add_argument("--doc-id", action="append", required=True, help="doc_id to remove")
+    delete.set_defaults(func=cmd_delete)
+
+    compact_parser = subparsers.add_parser("compact", help="Rewrite the index without tombstones")
+    compact_parser.set_defaults(func=cmd_compact)
+
+    status = subparsers.add_parser("status", help="Print the index manifest")
+    status.set_defaults(func=cmd_status)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
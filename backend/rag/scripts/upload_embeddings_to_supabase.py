@@ -7,6 +7,7 @@ Expected input JSONL records include:
 - doc_id
 - filename
 - chunk_index
+- page_start, page_end (optional)
 - text
 - embedding (list[float])
 """
@@ -22,6 +23,8 @@ import urllib.request
 from pathlib import Path
 from typing import Any
 
+from index_store import iter_live_rows
+
 
 def parse_env_file(path: Path) -> dict[str, str]:
     env: dict[str, str] = {}
@@ -98,29 +101,28 @@ def main() -> int:
     rows: list[dict[str, Any]] = []
     dims: set[int] = set()
 
-    with args.input_jsonl.open("r", encoding="utf-8") as f:
-        for line_no, line in enumerate(f, start=1):
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-            embedding = rec.get("embedding")
-            if not isinstance(embedding, list) or not embedding:
-                raise RuntimeError(f"Invalid embedding at line {line_no}")
-            dims.add(len(embedding))
-
-            rows.append(
-                {
-                    "doc_id": rec["chunk_id"],
-                    "content": rec.get("text", ""),
-                    "metadata": {
-                        "doc_id": rec.get("doc_id"),
-                        "filename": rec.get("filename"),
-                        "chunk_index": rec.get("chunk_index"),
-                    },
-                    # Supabase/Postgres can parse pgvector text input.
-                    "embedding": "[" + ",".join(str(x) for x in embedding) + "]",
-                }
-            )
+    # Only live rows are uploaded; tombstoned documents are skipped.
+    for rec in iter_live_rows(args.input_jsonl):
+        embedding = rec.get("embedding")
+        if not isinstance(embedding, list) or not embedding:
+            raise RuntimeError(f"Invalid embedding for chunk {rec.get('chunk_id')}")
+        dims.add(len(embedding))
+
+        rows.append(
+            {
+                "doc_id": rec["chunk_id"],
+                "content": rec.get("text", ""),
+                "metadata": {
+                    "doc_id": rec.get("doc_id"),
+                    "filename": rec.get("filename"),
+                    "chunk_index": rec.get("chunk_index"),
+                    "page_start": rec.get("page_start"),
+                    "page_end": rec.get("page_end"),
+                },
+                # Supabase/Postgres can parse pgvector text input.
+                "embedding": "[" + ",".join(str(x) for x in embedding) + "]",
+            }
+        )
 
     if len(dims) != 1:
         raise RuntimeError(f"Inconsistent embedding dimensions found: {sorted(dims)}")
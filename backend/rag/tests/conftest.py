@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The pipeline scripts are run directly rather than installed, so import them from scripts/.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
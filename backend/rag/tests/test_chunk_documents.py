@@ -0,0 +1,90 @@
+import random
+
+import pytest
+from chunk_documents import PAGE_SEPARATOR, chunk_records, iter_chunks
+
+
+def whole_text_chunks(pages, chunk_size, overlap):
+    """Reference: the original whole-document chunking plus per-character page owners."""
+    text = ""
+    owners = []
+    for i, (page, page_text) in enumerate(pages):
+        if i:
+            # Separators belong to the page before them.
+            text += PAGE_SEPARATOR
+            owners += [pages[i - 1][0]] * len(PAGE_SEPARATOR)
+        text += page_text
+        owners += [page] * len(page_text)
+
+    chunks = []
+    step = max(1, chunk_size - overlap)
+    for start in range(0, len(text), step):
+        raw = text[start : start + chunk_size]
+        chunk = raw.strip()
+        if chunk:
+            first = start + len(raw) - len(raw.lstrip())
+            chunks.append((chunk, owners[first], owners[first + len(chunk) - 1]))
+    return chunks
+
+
+def random_pages(rng, max_pages, max_len, numbered=True):
+    pages = []
+    for i in range(rng.randint(0, max_pages)):
+        text = "".join(rng.choice("abcdefgh \n") for _ in range(rng.randint(1, max_len)))
+        pages.append((i + 1 if numbered else None, text.strip() or "x"))
+    return pages
+
+
+@pytest.mark.parametrize(
+    ("chunk_size", "overlap", "max_len"),
+    [
+        (40, 10, 80),  # typical: pages longer than a step
+        (40, 10, 8),  # pages shorter than the step
+        (20, 20, 30),  # overlap == chunk_size, step falls back to 1
+        (20, 35, 30),  # overlap > chunk_size
+        (10, -15, 6),  # negative overlap: step jumps past short pages
+    ],
+)
+def test_matches_whole_text_chunking(chunk_size, overlap, max_len):
+    rng = random.Random(f"{chunk_size}-{overlap}-{max_len}")
+    for _ in range(300):
+        pages = random_pages(rng, 6, max_len)
+        expected = whole_text_chunks(pages, chunk_size, overlap)
+        assert list(iter_chunks(iter(pages), chunk_size, overlap)) == expected
+
+
+def test_records_without_page_numbers():
+    rng = random.Random(7)
+    for _ in range(100):
+        pages = random_pages(rng, 1, 120, numbered=False)
+        expected = whole_text_chunks(pages, 30, 10)
+        got = list(iter_chunks(iter(pages), 30, 10))
+        assert got == expected
+        assert all(start is None and end is None for _, start, end in got)
+
+
+def test_chunk_spanning_pages_reports_both():
+    pages = [(1, "aaaa"), (2, "bbbb")]
+    assert list(iter_chunks(pages, 8, 4)) == [
+        ("aaaa\n\nbb", 1, 2),
+        # Leading separator is stripped, so the chunk starts on page 2.
+        ("bbbb", 2, 2),
+        ("bb", 2, 2),
+    ]
+
+
+def test_files_sharing_doc_id_are_chunked_separately():
+    records = [
+        {"doc_id": "PMID_1", "filename": "PMID_1_main.pdf", "page": 1, "text": "main one"},
+        {"doc_id": "PMID_1", "filename": "PMID_1_main.pdf", "page": 2, "text": "main two"},
+        {"doc_id": "PMID_1", "filename": "PMID_1_supp.pdf", "page": 1, "text": "supp one"},
+    ]
+
+    chunks = list(chunk_records(records, chunk_size=100, overlap=0))
+
+    assert [(c["chunk_id"], c["filename"], c["page_start"], c["page_end"]) for c in chunks] == [
+        ("PMID_1_chunk_0000", "PMID_1_main.pdf", 1, 2),
+        ("PMID_1_chunk_0001", "PMID_1_supp.pdf", 1, 1),
+    ]
+    assert [c["chunk_index"] for c in chunks] == [0, 1]
+    assert chunks[1]["text"] == "supp one"
@@ -0,0 +1,175 @@
+import json
+
+import index_store
+import pytest
+from index_store import (
+    append_rows,
+    compact,
+    delete_docs,
+    index_version,
+    iter_live_rows,
+    live_doc_ids,
+    manifest_path,
+    read_manifest,
+)
+
+
+def row(doc_id, chunk_id):
+    return {"doc_id": doc_id, "chunk_id": chunk_id, "embedding": [1.0, 0.0]}
+
+
+def chunk_ids(path):
+    return [r["chunk_id"] for r in iter_live_rows(path)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "chunks_with_embeddings.jsonl"
+    append_rows(path, [row("A", "A0"), row("A", "A1"), row("B", "B0")])
+    return path
+
+
+def test_append_to_file_without_manifest(tmp_path):
+    path = tmp_path / "legacy.jsonl"
+    path.write_text("".join(json.dumps(r) + "\n" for r in [row("A", "A0"), row("B", "B0")]))
+    assert chunk_ids(path) == ["A0", "B0"]
+
+    manifest, _ = append_rows(path, [row("C", "C0")])
+
+    assert manifest_path(path).exists()
+    assert manifest["rows"] == 3
+    assert manifest["doc_rows"] == {"A": 1, "B": 1, "C": 1}
+    assert chunk_ids(path) == ["A0", "B0", "C0"]
+
+
+def test_delete_then_reappend_same_doc(index):
+    _, removed = delete_docs(index, ["A", "missing"])
+    assert removed == ["A"]
+    assert chunk_ids(index) == ["B0"]
+    assert live_doc_ids(index) == {"B"}
+
+    append_rows(index, [row("A", "A0-new")])
+
+    assert chunk_ids(index) == ["B0", "A0-new"]
+    assert live_doc_ids(index) == {"A", "B"}
+
+
+def test_live_doc_is_skipped_without_replace(index):
+    # Two appends that both saw "C" as new: the second must not duplicate it.
+    append_rows(index, [row("C", "C0")])
+    manifest, skipped = append_rows(index, [row("C", "C0-dup"), row("D", "D0")])
+
+    assert skipped == {"C"}
+    assert chunk_ids(index) == ["A0", "A1", "B0", "C0", "D0"]
+    assert manifest["doc_rows"]["C"] == 1
+
+
+def test_replace_existing_doc(index):
+    manifest, skipped = append_rows(index, [row("A", "A0-new")], replace=True)
+
+    assert skipped == set()
+
+    assert chunk_ids(index) == ["B0", "A0-new"]
+    assert manifest["rows"] == 4
+    assert manifest["dead_rows"] == 2
+    assert manifest["doc_rows"] == {"A": 1, "B": 1}
+
+
+def test_compaction_keeps_only_live_rows(index):
+    delete_docs(index, ["A"])
+    append_rows(index, [row("C", "C0")])
+    version = index_version(index)
+
+    manifest = compact(index)
+
+    assert chunk_ids(index) == ["B0", "C0"]
+    lines = index.read_text().splitlines()
+    assert [json.loads(line)["chunk_id"] for line in lines] == ["B0", "C0"]
+    assert manifest["rows"] == 2
+    assert manifest["dead_rows"] == 0
+    assert manifest["tombstones"] == {}
+    assert manifest["committed_bytes"] == index.stat().st_size
+    # Same live rows, so the version (and any cache keyed on it) survives.
+    assert index_version(index) == version
+
+
+def test_reader_snapshot_survives_append_and_compaction(index):
+    reader = iter_live_rows(index)
+    assert next(reader)["chunk_id"] == "A0"
+
+    append_rows(index, [row("C", "C0")])
+    delete_docs(index, ["B"])
+    compact(index)
+
+    assert [r["chunk_id"] for r in reader] == ["A1", "B0"]
+    assert chunk_ids(index) == ["A0", "A1", "C0"]
+
+
+def test_uncommitted_bytes_from_crashed_writer_are_truncated(index):
+    committed = read_manifest(index)["committed_bytes"]
+    with index.open("ab") as f:
+        f.write(b'{"doc_id": "X", "chunk_id": "X0", "emb')
+
+    assert chunk_ids(index) == ["A0", "A1", "B0"]
+
+    manifest, _ = append_rows(index, [row("C", "C0")])
+
+    assert chunk_ids(index) == ["A0", "A1", "B0", "C0"]
+    assert manifest["committed_bytes"] == index.stat().st_size
+    assert b'"X0"' not in index.read_bytes()[committed:]
+
+
+@pytest.mark.parametrize("operation", [lambda p: delete_docs(p, ["A"]), compact])
+def test_delete_and_compact_require_existing_index(tmp_path, operation):
+    path = tmp_path / "typo.jsonl"
+
+    with pytest.raises(FileNotFoundError):
+        operation(path)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_crash_between_data_swap_and_manifest_write(index, monkeypatch):
+    delete_docs(index, ["A"])
+    append_rows(index, [row("A", "A0-new")])
+    expected = ["B0", "A0-new"]
+
+    def crash(*args, **kwargs):
+        raise OSError("simulated crash")
+
+    monkeypatch.setattr(index_store, "_write_manifest", crash)
+    with pytest.raises(OSError, match="simulated crash"):
+        compact(index)
+    monkeypatch.undo()
+
+    # The stale manifest's tombstone offsets must not apply to the new file.
+    assert chunk_ids(index) == expected
+    assert live_doc_ids(index) == {"A", "B"}
+
+    manifest, _ = append_rows(index, [row("C", "C0")])
+
+    assert chunk_ids(index) == expected + ["C0"]
+    assert b"\0" not in index.read_bytes()
+    assert manifest["committed_bytes"] == index.stat().st_size
+
+
+def test_append_refuses_to_extend_short_file(index):
+    committed = read_manifest(index)["committed_bytes"]
+    with index.open("r+b") as f:
+        f.truncate(committed - 5)
+
+    with pytest.raises(RuntimeError, match="refusing to append"):
+        append_rows(index, [row("C", "C0")])
+
+    assert index.stat().st_size == committed - 5
+
+
+def test_reading_missing_index_leaves_no_files(tmp_path):
+    path = tmp_path / "missing.jsonl"
+
+    with pytest.raises(FileNotFoundError):
+        list(iter_live_rows(path))
+    with pytest.raises(FileNotFoundError):
+        index_version(path)
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import pytest
+from query_cache import SemanticQueryCache
+
+CONFIG = json.dumps(["intfloat/e5-small-v2", "auto", 5, "mock", "gpt-4o-mini"])
+
+
+def unit(*values):
+    vec = np.asarray([values], dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def at_similarity(similarity):
+    # Unit vector whose cosine with unit(1, 0) is exactly `similarity`.
+    return unit(similarity, float(np.sqrt(1 - similarity**2)))
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / "query_cache.json"
+
+
+def make_cache(cache_path, **kwargs):
+    kwargs.setdefault("threshold", 0.95)
+    return SemanticQueryCache(cache_path, index_version="v1", **kwargs)
+
+
+def test_threshold_boundary(cache_path):
+    cache = make_cache(cache_path)
+    cache.store("how many sets for hypertrophy", unit(1, 0), CONFIG, {"answer": "10"}, 2.0)
+
+    hit = cache.lookup(at_similarity(0.96), CONFIG)
+    assert hit is not None
+    entry, similarity = hit
+    assert entry["result"] == {"answer": "10"}
+    assert similarity == pytest.approx(0.96, abs=1e-5)
+
+    assert cache.lookup(at_similarity(0.94), CONFIG) is None
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+    assert cache.stats["saved_latency_s"] == 2.0
+    assert cache.hit_rate() == 0.5
+
+
+def test_config_mismatch_is_a_miss(cache_path):
+    cache = make_cache(cache_path)
+    cache.store("q", unit(1, 0), CONFIG, {"answer": "10"}, 1.0)
+
+    other = json.dumps(["intfloat/e5-small-v2", "auto", 3, "mock", "gpt-4o-mini"])
+    assert cache.lookup(unit(1, 0), other) is None
+
+
+def test_ttl_expiry(cache_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr("query_cache.time.time", lambda: now)
+    cache = make_cache(cache_path, ttl_s=60)
+    cache.store("q", unit(1, 0), CONFIG, {"answer": "10"}, 1.0)
+
+    now += 59
+    assert cache.lookup(unit(1, 0), CONFIG) is not None
+    now += 2
+    assert cache.lookup(unit(1, 0), CONFIG) is None
+    assert cache.entries == []
+
+
+def test_lru_eviction_order(cache_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr("query_cache.time.time", lambda: now)
+    cache = make_cache(cache_path, max_entries=2)
+    cache.store("a", unit(1, 0), CONFIG, {"answer": "a"}, 1.0)
+    now += 1
+    cache.store("b", unit(0, 1), CONFIG, {"answer": "b"}, 1.0)
+    now += 1
+    # Touch "a" so "b" becomes least recently used.
+    assert cache.lookup(unit(1, 0), CONFIG) is not None
+    now += 1
+    cache.store("c", unit(-1, 0), CONFIG, {"answer": "c"}, 1.0)
+
+    assert sorted(e["query"] for e in cache.entries) == ["a", "c"]
+
+
+def test_index_version_change_clears_cache(cache_path):
+    cache = make_cache(cache_path)
+    cache.store("q", unit(1, 0), CONFIG, {"answer": "10"}, 1.0)
+    cache.save()
+    assert len(make_cache(cache_path).entries) == 1
+
+    fresh = SemanticQueryCache(cache_path, index_version="v2")
+
+    assert fresh.entries == []
+    assert fresh.stats["invalidations"] == 1
+    assert fresh.lookup(unit(1, 0), CONFIG) is None
+
+
+def test_warning_answers_are_not_cached(cache_path):
+    cache = make_cache(cache_path)
+    cache.store("q", unit(1, 0), CONFIG, {"answer": "raw", "warning": "not JSON"}, 1.0)
+
+    assert cache.entries == []
+
+
+def test_corrupt_cache_file_is_treated_as_empty(cache_path):
+    cache_path.write_text('{"index_version": "v1", "entr')
+
+    cache = make_cache(cache_path)
+    assert cache.entries == []
+    cache.store("q", unit(1, 0), CONFIG, {"answer": "10"}, 1.0)
+    cache.save()
+
+    assert len(make_cache(cache_path).entries) == 1
+    assert [p.name for p in cache_path.parent.iterdir()] == [cache_path.name]